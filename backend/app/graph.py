@@ -3,6 +3,9 @@ from langgraph.graph import StateGraph, END
 import operator
 from app.nodes.brain import BrainNode
 from app.nodes.memory import MemoryNode
+from app.log import get_logger
+
+log = get_logger("graph")
 
 class AgentState(TypedDict):
     # The global state of the agent workflow
@@ -10,6 +13,8 @@ class AgentState(TypedDict):
     output: Optional[str]
     context: Annotated[List[str], operator.add]
     execution_log: Annotated[List[str], operator.add]
+    # Failures reported by nodes; a non-empty list means the run did not succeed
+    errors: Annotated[List[str], operator.add]
     # Use update/merge for intermediate_steps
     intermediate_steps: Annotated[Dict[str, Any], lambda x, y: {**x, **y}]
 
@@ -22,10 +27,10 @@ class GraphBuilder:
         self.workflow = StateGraph(AgentState)
 
     def build(self):
-        print(f"[GraphBuilder] Building with {len(self.nodes)} nodes and {len(self.edges)} edges.")
+        log.info("graph.build", nodes=len(self.nodes), edges=len(self.edges))
         # 1. Add Nodes
         for node in self.nodes:
-            print(f"[GraphBuilder] Adding node: {node.id} ({node.type})")
+            log.debug("graph.node_added", sample=0.1, node_id=node.id, node_type=node.type)
             node_id = node.id
             node_type = node.type
             config = node.config
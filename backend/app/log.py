@@ -0,0 +1,215 @@
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Dict, Optional
+
+# Structured logging for the execution engine.
+# Call sites emit an event name plus keyword fields; records are redacted in the
+# caller, pushed onto a bounded in-memory queue and written as JSON lines by a
+# background listener thread, so node hot paths never block on stdout.
+
+ROOT_LOGGER = "agentos"
+
+# Correlation ID of the workflow run currently executing in this context.
+# asyncio tasks copy the context on creation, so LangGraph node tasks inherit it.
+run_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("run_id", default=None)
+
+REDACTED = "[REDACTED]"
+# Matched against whole words of the snake_cased key, so `author` or `keyboard` are left alone
+_SECRET_KEY_RE = re.compile(r"(?:^|_)(tokens?|secrets?|passw\w*|pwd|api_?key|access_?key|auth|authorization|credentials?|connection_?string|account_?sid|private_?key)(?:_|$)")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_SECRET_VALUE_RE = re.compile(r"(sk-[A-Za-z0-9_\-]{8,}|gsk_[A-Za-z0-9]{8,}|AKIA[0-9A-Z]{16}|Bearer\s+[A-Za-z0-9._\-]+)")
+# Credential-looking query parameters in URLs (?api_key=..., &token=..., signed-URL signatures)
+_SECRET_QUERY_RE = re.compile(r"([?&][^=&#\s]*(?:token|secret|passw|key|auth|credential|sig)[^=&#\s]*=)[^&#\s]+", re.IGNORECASE)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def bind_run_id(run_id: Optional[str] = None) -> str:
+    """
+    Sets the correlation ID for the current context and returns it.
+    """
+    run_id = run_id or new_run_id()
+    run_id_var.set(run_id)
+    return run_id
+
+
+def _is_secret_key(key: str) -> bool:
+    return bool(_SECRET_KEY_RE.search(_CAMEL_RE.sub("_", key).lower().replace("-", "_")))
+
+
+def redact(value: Any, key: str = "") -> Any:
+    if key and value and not isinstance(value, (bool, int, float)) and _is_secret_key(key):
+        return REDACTED
+    if isinstance(value, str):
+        value = _SECRET_QUERY_RE.sub(rf"\1{REDACTED}", value)
+        return _SECRET_VALUE_RE.sub(REDACTED, value)
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class _Sampler:
+    """
+    Deterministic 1-in-N sampler keyed by event name.
+    """
+    def __init__(self):
+        self._counters: Dict[str, itertools.count] = {}
+        self.enabled = os.getenv("LOG_SAMPLING", "1") != "0"
+
+    def allow(self, event: str, rate: float) -> bool:
+        if not self.enabled or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        counter = self._counters.setdefault(event, itertools.count())
+        return next(counter) % max(1, round(1 / rate)) == 0
+
+
+_sampler = _Sampler()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        run_id = getattr(record, "run_id", None)
+        if run_id:
+            payload["run_id"] = run_id
+        payload.update(getattr(record, "fields", None) or {})
+        return json.dumps(payload, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking or erroring when the queue is full.
+    The number of dropped records is reported by `shutdown_logging`.
+    """
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fields and run_id are already on the record; skip QueueHandler's
+        # eager formatting so the JSON formatter runs on the listener thread.
+        # StructuredLogger formats tracebacks itself; this covers plain `logging` callers.
+        if record.exc_info:
+            exc = redact(logging.Formatter().formatException(record.exc_info))
+            record.fields = {**(getattr(record, "fields", None) or {}), "exc": exc}
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level: Optional[str] = None, stream=None):
+    """
+    Installs the queue-backed JSON sink on the `agentos` logger. Idempotent.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        root.propagate = False
+
+        sink = logging.StreamHandler(stream or sys.stdout)
+        sink.setFormatter(JsonFormatter())
+        log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        root.handlers = [_DroppingQueueHandler(log_queue)]
+        _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging():
+    """
+    Drains the queue and stops the listener thread.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger(ROOT_LOGGER)
+        dropped = sum(getattr(h, "dropped", 0) for h in root.handlers)
+        if dropped:
+            # The listener is stopped, so write straight to the sink
+            record = root.makeRecord(ROOT_LOGGER, logging.WARNING, __file__, 0, "logging.dropped", None, None,
+                                     extra={"fields": {"dropped": dropped}, "run_id": None})
+            for sink in _listener.handlers:
+                sink.handle(record)
+        _listener = None
+        root.handlers = []
+        root.propagate = True
+
+
+class StructuredLogger:
+    """
+    Thin wrapper over `logging.Logger` taking an event name and keyword fields:
+
+        log.info("graph.built", nodes=3, edges=2)
+        log.debug("graph.node_added", sample=0.1, node_id="n1")
+
+    `sample` keeps roughly that fraction of the event's records.
+    """
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def _log(self, level: int, event: str, sample: Optional[float] = None, exc_info=None, **fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample is not None and not _sampler.allow(event, sample):
+            return
+        if exc_info:
+            # Format here so the traceback goes through redaction with the other fields
+            fields["exc"] = traceback.format_exc().rstrip()
+        self._logger.log(
+            level,
+            redact(event),
+            extra={"fields": redact(fields), "run_id": run_id_var.get()},
+        )
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
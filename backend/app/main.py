@@ -2,20 +2,28 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import uvicorn
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 import os
 from dotenv import load_dotenv
+from app.log import get_logger, setup_logging, shutdown_logging, bind_run_id
+from app.nodes.write_behind import write_buffer
+from app.sessions import session_store
 
 load_dotenv()
 
+log = get_logger("api")
+
 # --- Lifespan ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Connect to DBs
-    print("AgentOS Engines Starting...")
+    setup_logging()
+    log.info("engine.startup")
     yield
     # Shutdown: Close connections
-    print("AgentOS Engines Shutting Down...")
+    log.info("engine.shutdown")
+    await write_buffer.flush_all()
+    shutdown_logging()
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -46,6 +54,8 @@ class WorkflowRequest(BaseModel):
     nodes: List[NodeData]
     edges: List[EdgeData]
     input_data: Optional[Dict[str, Any]] = {}
+    # Multi-turn chat: history is kept server-side under this id
+    session_id: Optional[str] = None
 
 # --- Endpoints ---
 @app.get("/health")
@@ -57,6 +67,7 @@ async def execute_workflow(request: WorkflowRequest):
     """
     Receives the frontend graph, compiles it into a LangGraph, and runs it.
     """
+    run_id = bind_run_id()
     try:
         from app.graph import GraphBuilder
         # Convert Pydantic models to dicts or objects as expected by Builder
@@ -67,18 +78,29 @@ async def execute_workflow(request: WorkflowRequest):
         graph = builder.build()
         
         # Execute
-        # We start with the User Input from the request
-        initial_state = {"input": request.input_data.get("input", ""), "context": [], "intermediate_steps": {}}
-        result = await graph.ainvoke(initial_state)
+        # We start with the User Input from the request, plus the session history if any
+        user_input = request.input_data.get("input", "")
+        lock = session_store.lock(request.agent_id, request.session_id) if request.session_id else nullcontext()
+        async with lock:
+            session = await session_store.get(request.agent_id, request.session_id) if request.session_id else None
+            context = session.context() if session else []
+            initial_state = {"input": user_input, "context": context, "intermediate_steps": {}}
+            result = await graph.ainvoke(initial_state)
+
+            if session:
+                await session_store.record_turn(session, user_input, result)
         
         return {
             "status": "success",
             "agent_id": request.agent_id,
+            "run_id": run_id,
+            "session_id": request.session_id,
             "output": result.get("output") or "No Output Generated (Check Logs)",
             "logs": result.get("execution_log", []),
             "full_state": result
         }
     except Exception as e:
+        log.exception("workflow.failed", agent_id=request.agent_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
@@ -1,7 +1,57 @@
-from typing import Dict, Any, List
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
+from app.log import get_logger
+
+log = get_logger("brain")
+
+
+def provider_for(model: str) -> str:
+    """
+    Maps a model name to its provider, using the same substring rules as `BrainNode._get_llm`.
+    """
+    if "gpt" in model:
+        return "openai"
+    if "claude" in model:
+        return "anthropic"
+    if "gemini" in model:
+        return "google"
+    if "mistral" in model or "codestral" in model:
+        return "mistral"
+    if "llama" in model or "mixtral" in model:
+        return "groq"
+    if "deepseek" in model:
+        return "deepseek"
+    return "openai"
+
+
+class ProviderLatencyStats:
+    """
+    Rolling window of successful call latencies per provider, shared across runs.
+    """
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, provider: str, seconds: float):
+        self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        samples = self._samples.get(provider)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+
+provider_stats = ProviderLatencyStats()
+
 
 class BrainNode:
     def __init__(self, config: Dict[str, Any]):
@@ -11,88 +61,184 @@ class BrainNode:
         self.temperature = config.get("temperature", 0.7)
         self.max_tokens = config.get("maxTokens", 2048)
         self.system_prompt = config.get("systemPrompt", "You are a helpful assistant.")
+        # Optional hedging: [{"llmModel": "claude-3-5-sonnet", "apiKey": "..."}, "gpt-4o-mini", ...]
+        # Entries without an apiKey reuse the primary key only for the same provider;
+        # otherwise the client falls back to its own env var (ANTHROPIC_API_KEY, GROQ_API_KEY, ...).
+        self.fallback_chain = config.get("fallbackChain") or []
+        self.hedge_percentile = config.get("hedgePercentile", 95)
+        self.hedge_delay_ms = config.get("hedgeDelayMs", 2000)
+
+    def _chain(self) -> List[Tuple[str, Optional[str]]]:
+        chain = [(self.model, self.api_key)]
+        for entry in self.fallback_chain:
+            if isinstance(entry, str):
+                model, api_key = entry, None
+            else:
+                model, api_key = entry.get("llmModel", self.model), entry.get("apiKey")
+            if not api_key and provider_for(model) == provider_for(self.model):
+                api_key = self.api_key
+            chain.append((model, api_key))
+        return chain
 
-    def _get_llm(self):
-        if "gpt" in self.model:
+    def _hedge_delay(self, model: str) -> float:
+        observed = provider_stats.percentile(provider_for(model), self.hedge_percentile)
+        if observed is None:
+            return self.hedge_delay_ms / 1000
+        return max(observed, 0.05)
+
+    async def _timed_invoke(self, model: str, api_key: Optional[str], messages):
+        llm = self._get_llm(model, api_key)
+        started = time.monotonic()
+        try:
+            response = await llm.ainvoke(messages)
+        except asyncio.CancelledError:
+            # Lost the race. If it had already run past its hedge delay, the elapsed
+            # time is a lower bound from the slow tail the percentile must see; a
+            # request cancelled sooner (typically a fallback beaten by the primary)
+            # says nothing about its latency and is not recorded.
+            elapsed = time.monotonic() - started
+            if elapsed >= self._hedge_delay(model):
+                provider_stats.record(provider_for(model), elapsed)
+            raise
+        provider_stats.record(provider_for(model), time.monotonic() - started)
+        return model, response
+
+    async def _hedged_invoke(self, messages):
+        """
+        Sends to the primary model, then to each fallback once the current request
+        has been outstanding past its provider's latency percentile (or has failed).
+        The first successful response wins; outstanding requests are cancelled.
+        """
+        chain = self._chain()
+        pending = set()
+        last_error: Optional[BaseException] = None
+        next_idx = 0
+
+        def launch():
+            nonlocal next_idx
+            model, api_key = chain[next_idx]
+            next_idx += 1
+            pending.add(asyncio.create_task(self._timed_invoke(model, api_key, messages)))
+            return model
+
+        current = launch()
+        try:
+            while pending:
+                timeout = self._hedge_delay(current) if next_idx < len(chain) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    log.info("brain.hedge", waiting_on=current, next_model=chain[next_idx][0], delay_s=round(timeout, 3))
+                    current = launch()
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        model, response = task.result()
+                        if model != self.model:
+                            log.info("brain.fallback_won", primary=self.model, model=model)
+                        return response
+                    last_error = task.exception()
+                    log.warning("brain.provider_error", error=str(last_error))
+                if next_idx < len(chain):
+                    current = launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _get_llm(self, model: Optional[str] = None, api_key: Optional[str] = None):
+        # An explicit model is paired with its own key (or None, letting the client read its env var)
+        if model is None:
+            model, api_key = self.model, self.api_key
+        if "gpt" in model:
             return ChatOpenAI(
-                model=self.model,
-                api_key=self.api_key,
+                model=model,
+                api_key=api_key,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-        elif "claude" in self.model:
+        elif "claude" in model:
             return ChatAnthropic(
-                model_name=self.model,
-                anthropic_api_key=self.api_key,
+                model_name=model,
+                anthropic_api_key=api_key,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-        elif "gemini" in self.model:
+        elif "gemini" in model:
             from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
-                model=self.model,
-                google_api_key=self.api_key,
+                model=model,
+                google_api_key=api_key,
                 temperature=self.temperature,
                 max_output_tokens=self.max_tokens
             )
-        elif "mistral" in self.model or "codestral" in self.model:
+        elif "mistral" in model or "codestral" in model:
             from langchain_mistralai import ChatMistralAI
             return ChatMistralAI(
-                model=self.model,
-                mistral_api_key=self.api_key,
+                model=model,
+                mistral_api_key=api_key,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-        elif "llama" in self.model or "mixtral" in self.model: # Groq
+        elif "llama" in model or "mixtral" in model: # Groq
             from langchain_groq import ChatGroq
             return ChatGroq(
-                model_name=self.model,
-                groq_api_key=self.api_key,
+                model_name=model,
+                groq_api_key=api_key,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-        elif "o1" in self.model:
+        elif "o1" in model:
             # O1 doesn't support system prompts in the same way, but LangChain handles it roughly.
             # We might need to ensure max_completion_tokens is used instead of max_tokens if using newer SDKs
             return ChatOpenAI(
-                 model=self.model,
-                 api_key=self.api_key,
+                 model=model,
+                 api_key=api_key,
                  temperature=1, # o1 often fixes temp at 1
                  max_completion_tokens=self.max_tokens # valid for o1
             )
-        elif "deepseek" in self.model:
+        elif "deepseek" in model:
             return ChatOpenAI(
-                model=self.model,
-                api_key=self.api_key,
+                model=model,
+                api_key=api_key,
                 base_url="https://api.deepseek.com",
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-        elif "deepseek" in self.model:
+        elif "deepseek" in model:
             return ChatOpenAI(
-                model=self.model,
-                api_key=self.api_key,
+                model=model,
+                api_key=api_key,
                 base_url="https://api.deepseek.com",
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
         else:
             # Default fallback
-            return ChatOpenAI(api_key=self.api_key)
+            return ChatOpenAI(api_key=api_key)
 
     async def process(self, input_text: str, context: str = "") -> str:
+        return (await self.run(input_text, context))[0]
+
+    async def run(self, input_text: str, context: str = "") -> Tuple[str, bool]:
+        """
+        Like `process`, but also reports whether the text is a real answer (True)
+        or an error message (False).
+        """
         if not self.api_key:
-            return "Error: Missing API Key. Please click the node to configure it."
+            return "Error: Missing API Key. Please click the node to configure it.", False
 
         try:
-            llm = self._get_llm()
-            
             messages = [
                 SystemMessage(content=self.system_prompt),
                 HumanMessage(content=f"Context: {context}\n\nUser Input: {input_text}")
             ]
             
-            response = await llm.ainvoke(messages)
-            return response.content
+            if self.fallback_chain:
+                response = await self._hedged_invoke(messages)
+            else:
+                response = await self._get_llm().ainvoke(messages)
+            return response.content, True
         except Exception as e:
-            return f"Error executing LLM: {str(e)}"
+            return f"Error executing LLM: {str(e)}", False
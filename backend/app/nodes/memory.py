@@ -1,5 +1,16 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Tuple
+import asyncio
+import json
 import os
+import sqlite3
+import time
+import uuid
+from app.log import get_logger
+from app.nodes.write_behind import write_buffer
+
+log = get_logger("memory")
+
+DEFAULT_SQLITE_PATH = os.getenv("MEMORY_SQLITE_PATH", "agentos_memory.db")
 
 class MemoryNode:
     def __init__(self, config: Dict[str, Any]):
@@ -8,29 +19,56 @@ class MemoryNode:
         self.memory_type = config.get("memoryType", "short-term")
         self.connection_string = config.get("connectionString")
         self.index_name = config.get("indexName", "default")
+        self.top_k = config.get("topK", 4)
+        self.batch_size = config.get("writeBatchSize", 50)
+        self.flush_interval = config.get("writeFlushMs", 1000) / 1000
+
+    @property
+    def _buffer_key(self):
+        connection = None if self.provider == "local" else self.connection_string
+        return (self.provider, connection, self.index_name)
 
     async def retrieve(self, query: str) -> str:
         """
         Retrieve context from memory based on the provider.
+        Items still waiting in the write-behind buffer are included (read-your-writes).
         """
+        # Snapshot before reading the backend: an item flushed in between then shows
+        # up in both, and is de-duplicated by id below rather than missed.
+        pending = write_buffer.pending(self._buffer_key)
+
         if self.provider == "mongodb":
-            return await self._retrieve_mongo(query)
+            stored = await self._retrieve_mongo(query)
         elif self.provider == "redis":
-            return await self._retrieve_redis(query)
+            stored = await self._retrieve_redis(query)
         elif self.provider == "pinecone":
-            return await self._retrieve_pinecone(query)
+            stored = await self._retrieve_pinecone(query)
         else:
-            return "Local memory not persisted."
+            rows = await self._retrieve_local(query)
+            seen = {item_id for item_id, _ in rows}
+            entries = [content for _, content in rows] + [i["content"] for i in pending if i["id"] not in seen]
+            return "\n".join(entries[-self.top_k:])
+
+        if not pending:
+            return stored
+        return "\n".join(filter(None, [stored] + [i["content"] for i in pending][-self.top_k:]))
 
     async def store(self, content: str, metadata: Dict = {}):
         """
-        Store content into memory.
+        Store content into memory. Returns immediately; the write is batched with
+        others for the same destination and flushed in bulk.
         """
-        if self.provider == "mongodb":
-            await self._store_mongo(content, metadata)
-        elif self.provider == "redis":
-            await self._store_redis(content, metadata)
-        # ... others
+        writers = {
+            "mongodb": self._store_mongo,
+            "redis": self._store_redis,
+            "local": self._store_local,
+        }
+        writer = writers.get(self.provider)
+        if writer is None:
+            # ... others
+            return
+        item = {"id": uuid.uuid4().hex, "content": content, "metadata": dict(metadata), "created_at": time.time()}
+        write_buffer.enqueue(self._buffer_key, writer, item, self.batch_size, self.flush_interval)
 
     # --- Implementations ---
     async def _retrieve_mongo(self, query: str) -> str:
@@ -41,15 +79,82 @@ class MemoryNode:
         # result = await collection.find_one({"text": {"$regex": query}})
         return f"[MongoDB] Retrieved context for: {query}"
 
-    async def _store_mongo(self, content: str, metadata: Dict):
-        # Placeholder
-        print(f"[MongoDB] Storing in {self.index_name}: {content}")
+    async def _store_mongo(self, items: List[Dict]):
+        if not self.connection_string:
+            log.debug("memory.store", sample=0.1, provider="mongodb", index=self.index_name, items=len(items))
+            return
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(self.connection_string)
+        try:
+            from pymongo.errors import BulkWriteError
+            # The item id as _id makes a re-sent batch idempotent
+            docs = [{"_id": i["id"], "text": i["content"], "metadata": i["metadata"], "created_at": i["created_at"]} for i in items]
+            try:
+                await client[self.index_name]["memories"].insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys (11000) are items already written by an earlier attempt
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+        finally:
+            client.close()
 
     async def _retrieve_redis(self, query: str) -> str:
         return f"[Redis] Retrieved context for: {query}"
 
-    async def _store_redis(self, content: str, metadata: Dict):
-        print(f"[Redis] Storing: {content}")
+    async def _store_redis(self, items: List[Dict]):
+        if not self.connection_string:
+            log.debug("memory.store", sample=0.1, provider="redis", index=self.index_name, items=len(items))
+            return
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(self.connection_string)
+        try:
+            await client.rpush(f"memories:{self.index_name}", *[i["content"] for i in items])
+        finally:
+            await client.aclose()
 
     async def _retrieve_pinecone(self, query: str) -> str:
         return f"[Pinecone] Vector search for: {query}"
+
+    # --- Local (SQLite) ---
+    def _sqlite(self) -> sqlite3.Connection:
+        # Always the server-configured path: connectionString arrives in the
+        # unauthenticated /execute body and must not pick files on disk.
+        conn = sqlite3.connect(DEFAULT_SQLITE_PATH)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS memories ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, item_id TEXT, index_name TEXT NOT NULL, "
+            "content TEXT NOT NULL, metadata TEXT, created_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_index ON memories (index_name, id)")
+        # Makes re-sent batches (retries, a write that finished after a timeout) idempotent
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_item ON memories (item_id)")
+        return conn
+
+    def _write_local(self, items: List[Dict]):
+        conn = self._sqlite()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO memories (item_id, index_name, content, metadata, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(i["id"], self.index_name, i["content"], json.dumps(i["metadata"]), i["created_at"]) for i in items],
+                )
+        finally:
+            conn.close()
+
+    def _read_local(self, limit: int) -> List[Tuple[str, str]]:
+        conn = self._sqlite()
+        try:
+            rows = conn.execute(
+                "SELECT item_id, content FROM memories WHERE index_name = ? ORDER BY id DESC LIMIT ?",
+                (self.index_name, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return list(reversed(rows))
+
+    async def _store_local(self, items: List[Dict]):
+        await asyncio.to_thread(self._write_local, items)
+
+    async def _retrieve_local(self, query: str) -> List[Tuple[str, str]]:
+        # Short-term local memory: the most recent (item_id, content) rows in this namespace.
+        return await asyncio.to_thread(self._read_local, self.top_k)
@@ -1,6 +1,10 @@
 from typing import Dict, Type, Callable, Any
+from urllib.parse import urlsplit
 from app.nodes.brain import BrainNode
 from app.nodes.memory import MemoryNode
+from app.log import get_logger
+
+log = get_logger("nodes")
 
 # Define a protocol or base class if needed, but for now we use loose typing
 # The runner function signature: async func(state: AgentState, config: Dict) -> Dict
@@ -33,15 +37,25 @@ class NodeRegistry:
                 log_entry = f"[Brain] processing input..."
                 try:
                     context_str = "\n".join(state.get("context", []))
-                    res = await node_instance.process(state.get("input", ""), context=context_str)
+                    res, ok = await node_instance.run(state.get("input", ""), context=context_str)
+                    if not ok:
+                        log.error("brain.error", error=res)
+                        return {
+                            "output": res,
+                            "intermediate_steps": {node_type: res},
+                            "errors": [res],
+                            "execution_log": [log_entry, f"[Brain] {res}"]
+                        }
                     return {
                         "output": res, 
                         "intermediate_steps": {node_type: res},
                         "execution_log": [log_entry, f"[Brain] Generated {len(res)} chars"]
                     }
                 except Exception as e:
+                    log.error("brain.error", error=str(e))
                     return {
                         "intermediate_steps": {node_type: f"Error: {e}"},
+                        "errors": [f"Error: {e}"],
                         "execution_log": [log_entry, f"[Brain] Error: {e}"]
                     }
             return brain_runner
@@ -75,7 +89,7 @@ class NodeRegistry:
             async def tool_runner(state):
                 tool_name = config.get("toolName", "unknown_tool")
                 schema = config.get("schema", "{}")
-                print(f"[Tool Registry] Registering tool: {tool_name} with schema len={len(schema)}")
+                log.debug("tool.registered", sample=0.1, tool=tool_name, schema_len=len(schema))
                 # In a real system, we would parse `config.get('code')` and register it to the LLM's toolset
                 return {"context": [f"Available Tool: {tool_name}"]}
             return tool_runner
@@ -85,7 +99,7 @@ class NodeRegistry:
                 action = config.get("action", "unknown")
                 platform = config.get("platform", "generic")
                 token = config.get("accessToken") # Specific to HubSpot Private Apps usually
-                print(f"[CRM] Executing {action} on {platform} with token_len={len(token or '')}")
+                log.info("crm.execute", action=action, platform=platform, has_token=bool(token))
                 return {"intermediate_steps": {f"crm-{action}": "Success"}}
             return crm_runner
             
@@ -99,7 +113,9 @@ class NodeRegistry:
                 # In real code: parse body template with jinja2 or f-strings using state
                 body = config.get("body", {})
                 
-                print(f"[API] {method} {url}")
+                # Query strings and userinfo often carry credentials; log the endpoint only
+                endpoint = urlsplit(url)
+                log.info("api.request", method=method, url=f"{endpoint.scheme}://{endpoint.netloc.rsplit('@', 1)[-1]}{endpoint.path}")
                 async with httpx.AsyncClient() as client:
                     try:
                         if method == "GET":
@@ -115,7 +131,7 @@ class NodeRegistry:
             async def doc_runner(state):
                 template = config.get("template", "")
                 output_format = config.get("outputFormat", "pdf")
-                print(f"[Doc Gen] Generating {output_format} from template len={len(template)}")
+                log.info("doc.generate", format=output_format, template_len=len(template))
                 # Real code: use reportlab or weasyprint
                 return {"intermediate_steps": {"doc-gen": f"Generated {output_format}"}}
             return doc_runner
@@ -126,10 +142,10 @@ class NodeRegistry:
                 if provider == "openai-moderation":
                     # Placeholder for OpenAI Mod API
                     blocked = config.get("blockedCategories", [])
-                    print(f"[Guard] Checking OpenAI Moderation for: {blocked}")
+                    log.debug("guard.moderation", sample=0.1, blocked=blocked)
                 else:
                     regex_list = config.get("customRegex", "").split("\n")
-                    print(f"[Guard] Checking {len(regex_list)} regex patterns.")
+                    log.debug("guard.regex", sample=0.1, patterns=len(regex_list))
                 
                 return {"intermediate_steps": {"guard-check": "Passed"}}
             return guard_runner
@@ -144,17 +160,17 @@ class NodeRegistry:
                      account_sid = config.get("accountSid")
                      auth_token = config.get("authToken")
                      from_number = config.get("fromNumber")
-                     print(f"[Output] Sending SMS to {dest} via Twilio ({from_number})")
+                     log.info("output.sms", destination=dest, from_number=from_number)
                 elif method == "whatsapp":
                      phone_id = config.get("phoneNumberId")
                      token = config.get("accessToken")
-                     print(f"[Output] Sending WhatsApp to {dest} using ID {phone_id}")
+                     log.info("output.whatsapp", destination=dest, phone_number_id=phone_id)
                 elif method == "storage":
                      bucket = config.get("bucketName")
                      key_id = config.get("accessKeyId")
-                     print(f"[Output] Uploading to bucket {bucket}/{dest} with KeyID {key_id}")
+                     log.info("output.storage", bucket=bucket, destination=dest)
                 else:
-                     print(f"[Output] Sending to {method}::{dest}")
+                     log.info("output.send", method=method, destination=dest)
                 
                 return {"intermediate_steps": {f"output-{method}": "Sent"}}
             return output_runner
@@ -170,7 +186,7 @@ class NodeRegistry:
                 cost = config.get("maxCost", 1.0)
                 retries = config.get("maxRetries", 3)
                 cb_threshold = config.get("failureThreshold", 5)
-                print(f"[Ops] Policy: Max Cost=${cost}, Retries={retries}, Circuit Breaker={cb_threshold} fails")
+                log.debug("ops.policy", sample=0.1, max_cost=cost, max_retries=retries, failure_threshold=cb_threshold)
                 return {"intermediate_steps": {"ops": "Approved"}}
             return ops_runner
             
@@ -179,7 +195,7 @@ class NodeRegistry:
                  appr = config.get("assignedOwner")
                  timeout = config.get("timeoutHours", 24)
                  escalation = config.get("escalation", "manager")
-                 print(f"[Human] Requesting approval from {appr}. Timeout: {timeout}h -> {escalation}")
+                 log.info("human.approval_requested", owner=appr, timeout_hours=timeout, escalation=escalation)
                  # In LangGraph, this would return a command to interrupt execution
                  return {"intermediate_steps": {"human": "Waiting for Approval"}}
              return human_runner
@@ -204,7 +220,7 @@ class NodeRegistry:
             async def router_runner(state):
                 # In a real graph, this would return a conditional edge, but for now we log it
                 rule_type = config.get("routingType", "static")
-                print(f"[Router] Routing based on {rule_type}")
+                log.debug("router.route", sample=0.1, routing_type=rule_type)
                 return {"intermediate_steps": {"router": "Routed"}}
             return router_runner
 
@@ -224,6 +240,6 @@ class NodeRegistry:
 
         else:
              async def generic_runner(state):
-                print(f"[Warn] No runner found for {node_type}, passing state.")
+                log.warning("runner.missing", node_type=node_type)
                 return {}
              return generic_runner
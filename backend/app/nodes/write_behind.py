@@ -0,0 +1,157 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.log import get_logger
+
+log = get_logger("write_behind")
+
+# A batch writer receives every buffered item for one destination in a single call.
+BatchWriter = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# Upper bound on buffered items per destination; the oldest are dropped past this
+# so a backend that stays down cannot grow memory without limit.
+MAX_BUFFERED_ITEMS = int(os.getenv("WRITE_BEHIND_MAX_ITEMS", "10000"))
+MAX_RETRY_DELAY = 30.0
+
+
+class _Destination:
+    def __init__(self, writer: BatchWriter, batch_size: int, flush_interval: float):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.items: List[Dict[str, Any]] = []
+        # The batch currently being written; still reported by `pending()`.
+        self.in_flight: List[Dict[str, Any]] = []
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        # Task currently inside `_flush` holding `lock`.
+        self.flusher: Optional[asyncio.Task] = None
+
+
+class WriteBehindBuffer:
+    """
+    Buffers memory writes per destination and flushes them in bulk, either once
+    `batch_size` items are queued or `flush_interval` seconds after the first one.
+    Failed batches are retried with exponential backoff. Items stay visible
+    through `pending()` until their batch has been written.
+    """
+    def __init__(self, max_items: int = MAX_BUFFERED_ITEMS):
+        self.max_items = max_items
+        self._destinations: Dict[Tuple, _Destination] = {}
+        self._tasks: set = set()
+        self._closing = False
+
+    def enqueue(self, key: Tuple, writer: BatchWriter, item: Dict[str, Any], batch_size: int = 50, flush_interval: float = 1.0):
+        """
+        Queues `item` for `key`. The writer and batching settings of the most
+        recent call apply to everything buffered for that destination.
+        """
+        dest = self._destinations.get(key)
+        if dest is None:
+            dest = self._destinations[key] = _Destination(writer, batch_size, flush_interval)
+        dest.writer, dest.batch_size, dest.flush_interval = writer, batch_size, flush_interval
+
+        overflow = len(dest.items) + len(dest.in_flight) + 1 - self.max_items
+        if overflow > 0:
+            dropped = dest.items[:overflow]
+            del dest.items[:overflow]
+            log.error("memory.buffer_overflow", destination=key[0], dropped=len(dropped), items=[i.get("content") for i in dropped])
+        dest.items.append(item)
+
+        if len(dest.items) >= dest.batch_size and not dest.lock.locked():
+            self._spawn(self._flush_now(key))
+        else:
+            self._ensure_timer(key)
+
+    def pending(self, key: Tuple) -> List[Dict[str, Any]]:
+        dest = self._destinations.get(key)
+        return dest.in_flight + dest.items if dest else []
+
+    async def flush_all(self, retries: int = 3, retry_delay: float = 0.1):
+        """
+        Writes everything still buffered. Called from the app lifespan on shutdown.
+        Each destination gets `retries` attempts; anything still unwritten is logged
+        with its contents and dropped.
+        """
+        self._closing = True
+        for dest in self._destinations.values():
+            # A timer in the middle of a write is left to finish: cancelling it would not
+            # stop a write already handed to a thread or server, and the batch would be
+            # written twice. Idle timers are cancelled; busy ones stop after this flush.
+            if dest.timer and not dest.timer.done() and dest.flusher is not dest.timer:
+                dest.timer.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        async def drain(key: Tuple):
+            dest = self._destinations[key]
+            for attempt in range(retries):
+                if await self._flush(key):
+                    return
+                await asyncio.sleep(retry_delay * 2 ** attempt)
+            if dest.items:
+                log.error("memory.dropped_on_shutdown", destination=key[0], dropped=len(dest.items), items=[i.get("content") for i in dest.items])
+                dest.items.clear()
+
+        await asyncio.gather(*(drain(key) for key in list(self._destinations)))
+        self._closing = False
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _ensure_timer(self, key: Tuple):
+        dest = self._destinations[key]
+        if self._closing:
+            return
+        if dest.timer is None or dest.timer.done():
+            dest.timer = self._spawn(self._flush_later(key))
+
+    async def _flush_now(self, key: Tuple):
+        if not await self._flush(key):
+            self._ensure_timer(key)
+
+    async def _flush_later(self, key: Tuple):
+        dest = self._destinations[key]
+        delay = dest.flush_interval
+        while True:
+            await asyncio.sleep(delay)
+            if await self._flush(key) or self._closing:
+                return
+            delay = min(max(delay, 0.01) * 2, MAX_RETRY_DELAY)
+
+    async def _flush(self, key: Tuple) -> bool:
+        """
+        Writes queued items batch by batch. Returns False if a batch failed; the
+        failed batch goes back to the front of the queue.
+        """
+        dest = self._destinations[key]
+        async with dest.lock:
+            dest.flusher = asyncio.current_task()
+            try:
+                return await self._write_batches(key, dest)
+            finally:
+                dest.flusher = None
+
+    async def _write_batches(self, key: Tuple, dest: _Destination) -> bool:
+        while dest.items:
+            batch = dest.items[:dest.batch_size]
+            del dest.items[:len(batch)]
+            dest.in_flight = batch
+            try:
+                await dest.writer(batch)
+            except BaseException as e:
+                dest.items[:0] = batch
+                if not isinstance(e, Exception):
+                    raise
+                log.error("memory.flush_failed", destination=key[0], items=len(batch), error=str(e))
+                return False
+            finally:
+                dest.in_flight = []
+            log.debug("memory.flushed", sample=0.1, destination=key[0], items=len(batch))
+        return True
+
+
+write_buffer = WriteBehindBuffer()
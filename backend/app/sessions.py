@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from app.log import get_logger
+
+log = get_logger("sessions")
+
+SESSION_DIR = os.getenv("SESSION_DIR", ".sessions")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+# Compaction kicks in once the stored turns exceed this many characters.
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", "4000"))
+# After compaction, recent exchanges are kept verbatim up to this many characters
+# and at most SESSION_KEEP_TURNS exchanges; the last exchange is always kept.
+SESSION_KEEP_CHARS = int(os.getenv("SESSION_KEEP_CHARS", str(SESSION_MAX_CHARS // 2)))
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "4"))
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "1500"))
+
+
+def _condense(text: str, limit: int = 160) -> str:
+    text = " ".join(text.split())
+    first = text.split(". ")[0]
+    return first if len(first) <= limit else first[:limit - 3] + "..."
+
+
+class Session:
+    def __init__(self, agent_id: str, session_id: str, summary: str = "", turns: Optional[List[Dict[str, str]]] = None):
+        self.agent_id = agent_id
+        self.session_id = session_id
+        self.summary = summary
+        self.turns = turns or []
+
+    def context(self) -> List[str]:
+        """
+        Renders the session as `AgentState.context` lines.
+        """
+        lines = [f"Conversation summary: {self.summary}"] if self.summary else []
+        lines += [f"{t['role'].capitalize()}: {t['content']}" for t in self.turns]
+        return lines
+
+    def add_turn(self, user_input: str, output: str):
+        self.turns.append({"role": "user", "content": user_input})
+        self.turns.append({"role": "assistant", "content": output})
+
+    def _kept_tail(self) -> int:
+        """
+        Number of trailing turns to keep verbatim: whole exchanges, newest first,
+        within SESSION_KEEP_CHARS and SESSION_KEEP_TURNS, but at least the last one.
+        """
+        limit = min(max(1, SESSION_KEEP_TURNS) * 2, len(self.turns))
+        kept = min(2, len(self.turns))
+        used = sum(len(t["content"]) for t in self.turns[-kept:]) if kept else 0
+        while kept + 2 <= limit:
+            exchange = sum(len(t["content"]) for t in self.turns[-kept - 2:-kept])
+            if used + exchange > SESSION_KEEP_CHARS:
+                break
+            used += exchange
+            kept += 2
+        return kept
+
+    def compact(self) -> bool:
+        """
+        Folds older turns into the rolling summary once the transcript passes
+        SESSION_MAX_CHARS, keeping a recent tail verbatim (see `_kept_tail`). The
+        summary is extractive (first sentence of each turn) and capped at
+        SESSION_SUMMARY_CHARS, keeping the most recent material, so the rendered
+        context stays bounded.
+        """
+        if sum(len(t["content"]) for t in self.turns) <= SESSION_MAX_CHARS:
+            return False
+        keep = self._kept_tail()
+        older, self.turns = self.turns[:len(self.turns) - keep], self.turns[len(self.turns) - keep:]
+        if not older:
+            return False
+        folded = " | ".join(f"{t['role']}: {_condense(t['content'])}" for t in older)
+        summary = f"{self.summary} | {folded}" if self.summary else folded
+        if len(summary) > SESSION_SUMMARY_CHARS:
+            # Drop the oldest entries, cutting on an entry boundary
+            summary = summary[-SESSION_SUMMARY_CHARS:]
+            summary = summary.split(" | ", 1)[-1]
+        self.summary = summary
+        return True
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.agent_id, self.session_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"agent_id": self.agent_id, "id": self.session_id, "summary": self.summary, "turns": self.turns}
+
+
+class SessionStore:
+    """
+    Sessions persisted as compact JSON files, with an in-memory LRU of hot sessions.
+    Sessions are scoped per agent: the same session id under two agents is two transcripts.
+    """
+    def __init__(self, directory: str = SESSION_DIR, capacity: int = SESSION_CACHE_SIZE):
+        self.directory = directory
+        self.capacity = capacity
+        self._cache: "OrderedDict[Tuple[str, str], Session]" = OrderedDict()
+        # Independent of the LRU: lock plus the number of holders and waiters.
+        # An entry is removed only once nobody holds or waits on it.
+        self._locks: Dict[Tuple[str, str], List] = {}
+
+    @asynccontextmanager
+    async def lock(self, agent_id: str, session_id: str):
+        """
+        Serialises turns of the same session so concurrent requests don't lose history.
+        """
+        key = (agent_id, session_id)
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _path(self, agent_id: str, session_id: str) -> str:
+        # Hash the client-supplied ids so they can never escape the session directory.
+        digest = hashlib.sha256(f"{agent_id}\0{session_id}".encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _read(self, agent_id: str, session_id: str) -> Session:
+        try:
+            with open(self._path(agent_id, session_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return Session(agent_id, session_id, data.get("summary", ""), data.get("turns", []))
+        except FileNotFoundError:
+            return Session(agent_id, session_id)
+        except (ValueError, AttributeError) as e:
+            # Corrupt or truncated file: start over rather than failing every later turn
+            log.warning("session.corrupt", agent_id=agent_id, session_id=session_id, error=str(e))
+            return Session(agent_id, session_id)
+
+    def _write(self, session: Session):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(session.agent_id, session.session_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _remember(self, session: Session):
+        self._cache[session.key] = session
+        self._cache.move_to_end(session.key)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    async def get(self, agent_id: str, session_id: str) -> Session:
+        session = self._cache.get((agent_id, session_id))
+        if session is None:
+            session = await asyncio.to_thread(self._read, agent_id, session_id)
+        self._remember(session)
+        return session
+
+    async def record_turn(self, session: Session, user_input: str, result: Dict[str, Any]) -> bool:
+        """
+        Appends the run's exchange and saves the session. Runs that reported
+        `errors` (e.g. a failed LLM call) are not kept as history.
+        """
+        if not result.get("output") or result.get("errors"):
+            return False
+        session.add_turn(user_input, result["output"])
+        await self.save(session)
+        return True
+
+    async def save(self, session: Session):
+        if session.compact():
+            log.info("session.compacted", agent_id=session.agent_id, session_id=session.session_id, summary_len=len(session.summary), turns=len(session.turns))
+        self._remember(session)
+        await asyncio.to_thread(self._write, session)
+
+
+session_store = SessionStore()
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_anthropic")
+
+from app.nodes import brain
+from app.nodes.brain import BrainNode, ProviderLatencyStats
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """
+    Stands in for a LangChain chat model: sleeps for `delay` then answers, or raises.
+    """
+    def __init__(self, model, delay, fail=False, calls=None):
+        self.model = model
+        self.delay = delay
+        self.fail = fail
+        self.calls = calls
+        self.cancelled = False
+
+    async def ainvoke(self, messages):
+        self.calls.append(self.model)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.model} unavailable")
+        return FakeResponse(f"answer from {self.model}")
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = ProviderLatencyStats()
+    monkeypatch.setattr(brain, "provider_stats", fresh)
+    return fresh
+
+
+def make_node(monkeypatch, behaviour, **config):
+    calls, clients = [], {}
+
+    def fake_get_llm(self, model=None, api_key=None):
+        delay, fail = behaviour[model]
+        clients[model] = FakeLLM(model, delay, fail, calls)
+        return clients[model]
+
+    monkeypatch.setattr(BrainNode, "_get_llm", fake_get_llm)
+    node = BrainNode({"llmModel": "gpt-4o", "apiKey": "sk-openai", **config})
+    return node, calls, clients
+
+
+def test_hedge_first_answer_wins_and_loser_is_cancelled(monkeypatch, stats):
+    node, calls, clients = make_node(
+        monkeypatch,
+        {"gpt-4o": (1.0, False), "claude-3": (0.05, False)},
+        fallbackChain=["claude-3"],
+        hedgeDelayMs=50,
+    )
+    started = time.monotonic()
+    result = asyncio.run(node.process("hi"))
+
+    assert result == "answer from claude-3"
+    assert time.monotonic() - started < 0.5
+    assert calls == ["gpt-4o", "claude-3"]
+    assert clients["gpt-4o"].cancelled
+    # The cancelled primary still contributes a (lower-bound) latency sample
+    assert len(stats._samples["openai"]) == 1
+    assert len(stats._samples["anthropic"]) == 1
+
+
+def test_fallback_cancelled_early_does_not_skew_its_stats(monkeypatch, stats):
+    node, calls, clients = make_node(
+        monkeypatch,
+        {"gpt-4o": (0.08, False), "claude-3": (1.0, False)},
+        fallbackChain=["claude-3"],
+        hedgeDelayMs=50,
+    )
+    for _ in range(3):
+        assert asyncio.run(node.process("hi")) == "answer from gpt-4o"
+
+    assert calls == ["gpt-4o", "claude-3"] * 3
+    assert clients["claude-3"].cancelled
+    assert "anthropic" not in stats._samples
+    assert len(stats._samples["openai"]) == 3
+
+
+def test_fast_primary_does_not_hedge(monkeypatch, stats):
+    node, calls, _ = make_node(
+        monkeypatch,
+        {"gpt-4o": (0.01, False), "claude-3": (0.01, False)},
+        fallbackChain=["claude-3"],
+        hedgeDelayMs=500,
+    )
+    assert asyncio.run(node.process("hi")) == "answer from gpt-4o"
+    assert calls == ["gpt-4o"]
+
+
+def test_failed_primary_falls_back_without_waiting_for_hedge_delay(monkeypatch, stats):
+    node, calls, _ = make_node(
+        monkeypatch,
+        {"gpt-4o": (0, True), "claude-3": (0.01, False)},
+        fallbackChain=["claude-3"],
+        hedgeDelayMs=10_000,
+    )
+    started = time.monotonic()
+    assert asyncio.run(node.process("hi")) == "answer from claude-3"
+    assert time.monotonic() - started < 1
+    assert calls == ["gpt-4o", "claude-3"]
+
+
+def test_all_providers_failing_surfaces_last_error(monkeypatch, stats):
+    node, _, _ = make_node(
+        monkeypatch,
+        {"gpt-4o": (0, True), "claude-3": (0, True)},
+        fallbackChain=["claude-3"],
+    )
+    assert asyncio.run(node.process("hi")) == "Error executing LLM: claude-3 unavailable"
+
+
+def test_hedge_delay_follows_observed_percentile(stats):
+    node = BrainNode({"llmModel": "gpt-4o", "apiKey": "sk", "hedgeDelayMs": 2000})
+    assert node._hedge_delay("gpt-4o") == 2.0
+    for i in range(1, 101):
+        stats.record("openai", i / 100)
+    assert node._hedge_delay("gpt-4o") == pytest.approx(0.95, abs=0.01)
+
+
+def test_primary_key_is_only_reused_for_the_same_provider():
+    node = BrainNode({
+        "llmModel": "gpt-4o",
+        "apiKey": "sk-openai",
+        "fallbackChain": ["claude-3", "gpt-4o-mini", {"llmModel": "llama-3", "apiKey": "gsk-groq"}, {"llmModel": "gemini-pro"}],
+    })
+    assert node._chain() == [
+        ("gpt-4o", "sk-openai"),
+        ("claude-3", None),
+        ("gpt-4o-mini", "sk-openai"),
+        ("llama-3", "gsk-groq"),
+        ("gemini-pro", None),
+    ]
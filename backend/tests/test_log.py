@@ -0,0 +1,109 @@
+import asyncio
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from app import log as applog
+from app.log import REDACTED, bind_run_id, get_logger, redact, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """
+    Installs the real queue-backed sink on a buffer; yields a function returning parsed lines.
+    """
+    stream = io.StringIO()
+    setup_logging(level="DEBUG", stream=stream)
+
+    def lines():
+        shutdown_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    shutdown_logging()
+
+
+def test_redacts_secret_keys_values_and_query_params():
+    fields = redact({
+        "accessToken": "abc",
+        "apiKey": "xyz",
+        "connectionString": "mongodb://user:pw@host",
+        "note": "key sk-abcdefghijkl and Bearer eyJ.abc",
+        "url": "https://h/p?api_key=abc&page=2&X-Amz-Signature=ff",
+    })
+    assert fields["accessToken"] == fields["apiKey"] == fields["connectionString"] == REDACTED
+    assert fields["note"] == f"key {REDACTED} and {REDACTED}"
+    assert fields["url"] == f"https://h/p?api_key={REDACTED}&page=2&X-Amz-Signature={REDACTED}"
+
+
+def test_does_not_over_redact():
+    fields = {"author": "Ada", "keyboard": "qwerty", "max_tokens": 2048, "has_token": True, "page": "2"}
+    assert redact(fields) == fields
+
+
+def test_exception_traceback_is_redacted(captured):
+    try:
+        raise RuntimeError("GET https://h/p?api_key=topsecret failed with sk-abcdefghijkl")
+    except RuntimeError as e:
+        get_logger("test").exception("workflow.failed", error=str(e))
+
+    [line] = [l for l in captured() if l["event"] == "workflow.failed"]
+    assert "RuntimeError" in line["exc"]
+    for field in ("exc", "error"):
+        assert "topsecret" not in line[field]
+        assert "sk-abcdefghijkl" not in line[field]
+
+
+def test_sampling_keeps_one_in_n(captured, monkeypatch):
+    monkeypatch.setattr(applog._sampler, "enabled", True)
+    logger = get_logger("test")
+    for i in range(20):
+        logger.debug("test.sampled_quarter", sample=0.25, i=i)
+    logger.debug("test.unsampled")
+
+    lines = captured()
+    assert [l["i"] for l in lines if l["event"] == "test.sampled_quarter"] == [0, 4, 8, 12, 16]
+    assert any(l["event"] == "test.unsampled" for l in lines)
+
+
+def test_run_id_propagates_to_node_tasks(captured):
+    logger = get_logger("test")
+
+    async def node(name):
+        logger.info("test.node", node=name)
+
+    async def run():
+        run_id = bind_run_id()
+        await asyncio.gather(node("a"), node("b"))
+        return run_id
+
+    async def main():
+        # Each request runs in its own task, like concurrent /execute calls
+        return await asyncio.gather(asyncio.create_task(run()), asyncio.create_task(run()))
+
+    first, second = asyncio.run(main())
+    by_run = {}
+    for l in captured():
+        if l["event"] == "test.node":
+            by_run.setdefault(l["run_id"], []).append(l["node"])
+    assert first != second
+    assert sorted(by_run) == sorted([first, second])
+    assert all(sorted(nodes) == ["a", "b"] for nodes in by_run.values())
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = applog._DroppingQueueHandler(queue.Queue(maxsize=1))
+    for i in range(3):
+        handler.emit(logging.makeLogRecord({"msg": f"m{i}", "fields": {}}))
+    assert handler.dropped == 2
+    assert handler.queue.qsize() == 1
+
+
+def test_dropped_records_are_reported_on_shutdown(captured):
+    logging.getLogger(applog.ROOT_LOGGER).handlers[0].dropped = 3
+    [line] = [l for l in captured() if l["event"] == "logging.dropped"]
+    assert line["level"] == "warning"
+    assert line["dropped"] == 3
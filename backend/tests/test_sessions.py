@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app import sessions
+from app.sessions import Session, SessionStore
+
+
+def test_sessions_are_scoped_per_agent(tmp_path):
+    async def scenario():
+        store = SessionStore(directory=str(tmp_path))
+        first = await store.get("agent-a", "chat-1")
+        first.add_turn("hello", "hi from a")
+        await store.save(first)
+
+        fresh = SessionStore(directory=str(tmp_path))
+        return await fresh.get("agent-a", "chat-1"), await fresh.get("agent-b", "chat-1")
+
+    a, b = asyncio.run(scenario())
+    assert a.context() == ["User: hello", "Assistant: hi from a"]
+    assert b.context() == []
+
+
+def test_corrupt_session_file_starts_a_new_session(tmp_path):
+    async def scenario():
+        store = SessionStore(directory=str(tmp_path))
+        session = await store.get("agent-a", "chat-1")
+        session.add_turn("hello", "hi")
+        await store.save(session)
+        path = store._path("agent-a", "chat-1")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"summary": "trunc')
+
+        fresh = SessionStore(directory=str(tmp_path))
+        recovered = await fresh.get("agent-a", "chat-1")
+        recovered.add_turn("again", "ok")
+        await fresh.save(recovered)
+        return await SessionStore(directory=str(tmp_path)).get("agent-a", "chat-1")
+
+    assert asyncio.run(scenario()).context() == ["User: again", "Assistant: ok"]
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_MAX_CHARS", 4000)
+    monkeypatch.setattr(sessions, "SESSION_KEEP_CHARS", 2000)
+    monkeypatch.setattr(sessions, "SESSION_KEEP_TURNS", 4)
+    monkeypatch.setattr(sessions, "SESSION_SUMMARY_CHARS", 1500)
+
+
+def test_compact_folds_older_turns_into_summary(limits):
+    session = Session("agent-a", "chat-1")
+    for n in range(10):
+        session.add_turn(f"question {n}. " + "q" * 300, f"answer {n}. " + "a" * 300)
+
+    assert session.compact()
+    assert session.summary.startswith("user: question 0 | assistant: answer 0")
+    assert session.turns[-1]["content"].startswith("answer 9.")
+    assert sum(len(t["content"]) for t in session.turns) <= sessions.SESSION_KEEP_CHARS
+    assert not session.compact()
+
+
+def test_large_turns_are_compacted_by_characters_not_turn_count(limits):
+    session = Session("agent-a", "chat-1")
+    session.add_turn("x" * 3000, "y" * 3000)
+    session.add_turn("z" * 3000, "w" * 3000)
+
+    assert session.compact()
+    # Only the last exchange survives verbatim; the rest went to the summary
+    assert [t["content"][0] for t in session.turns] == ["z", "w"]
+
+
+def test_keep_turns_zero_still_compacts(limits, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_KEEP_TURNS", 0)
+    session = Session("agent-a", "chat-1")
+    for n in range(5):
+        session.add_turn("q" * 500, "a" * 500)
+
+    assert session.compact()
+    assert len(session.turns) == 2
+
+
+def test_context_stays_bounded_over_many_turns(limits):
+    session = Session("agent-a", "chat-1")
+    sizes = []
+    for n in range(200):
+        session.add_turn(f"question {n}. " + "q" * (n % 7) * 400, f"answer {n}. " + "a" * (n % 5) * 600)
+        session.compact()
+        assert len(session.summary) <= sessions.SESSION_SUMMARY_CHARS
+        sizes.append(len("\n".join(session.context())))
+
+    last_exchange = max(len("q" * 6 * 400) + len("a" * 4 * 600) + 40, sessions.SESSION_MAX_CHARS)
+    assert max(sizes) <= sessions.SESSION_SUMMARY_CHARS + last_exchange + 100
+
+
+def test_failed_runs_are_not_recorded(tmp_path):
+    async def scenario():
+        store = SessionStore(directory=str(tmp_path))
+        session = await store.get("agent-a", "chat-1")
+        failed = await store.record_turn(session, "hello", {
+            "output": "Error: Missing API Key. Please click the node to configure it.",
+            "errors": ["Error: Missing API Key. Please click the node to configure it."],
+        })
+        ok = await store.record_turn(session, "hello", {"output": "hi", "errors": []})
+        return failed, ok, await SessionStore(directory=str(tmp_path)).get("agent-a", "chat-1")
+
+    failed, ok, reloaded = asyncio.run(scenario())
+    assert (failed, ok) == (False, True)
+    assert reloaded.context() == ["User: hello", "Assistant: hi"]
+
+
+def test_session_lock_survives_cache_eviction_while_contended(tmp_path):
+    async def scenario():
+        store = SessionStore(directory=str(tmp_path), capacity=1)
+        order = []
+
+        async def turn(name):
+            async with store.lock("agent-a", "chat-1"):
+                order.append(f"{name}-start")
+                await store.get("agent-a", f"other-{name}")  # evicts chat-1 from the LRU
+                await asyncio.sleep(0.01)
+                order.append(f"{name}-end")
+
+        await asyncio.gather(turn("a"), turn("b"), turn("c"))
+        return order, store._locks
+
+    order, locks = asyncio.run(scenario())
+    assert order == ["a-start", "a-end", "b-start", "b-end", "c-start", "c-end"]
+    assert locks == {}
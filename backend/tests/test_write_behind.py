@@ -0,0 +1,251 @@
+import asyncio
+
+import pytest
+
+from app.nodes import memory
+from app.nodes.memory import MemoryNode
+from app.nodes.write_behind import WriteBehindBuffer
+
+KEY = ("local", None, "default")
+
+
+class FakeWriter:
+    """
+    Records batches; fails the first `failures` calls and can be held open on `gate`.
+    """
+    def __init__(self, failures=0, gate=None):
+        self.failures = failures
+        self.gate = gate
+        self.attempts = 0
+        self.batches = []
+
+    async def __call__(self, batch):
+        self.attempts += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.attempts <= self.failures:
+            raise ConnectionError("backend down")
+        self.batches.append([i["content"] for i in batch])
+
+
+def item(n):
+    return {"id": str(n), "content": f"turn {n}"}
+
+
+def test_flushes_when_batch_size_is_reached():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter()
+        for n in range(3):
+            buffer.enqueue(KEY, writer, item(n), batch_size=3, flush_interval=10)
+        await asyncio.sleep(0.01)
+        return buffer, writer
+
+    buffer, writer = asyncio.run(scenario())
+    assert writer.batches == [["turn 0", "turn 1", "turn 2"]]
+    assert buffer.pending(KEY) == []
+
+
+def test_flushes_after_interval():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter()
+        buffer.enqueue(KEY, writer, item(0), batch_size=100, flush_interval=0.05)
+        buffer.enqueue(KEY, writer, item(1), batch_size=100, flush_interval=0.05)
+        assert writer.batches == []
+        await asyncio.sleep(0.15)
+        return writer
+
+    assert asyncio.run(scenario()).batches == [["turn 0", "turn 1"]]
+
+
+def test_latest_batch_settings_apply():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter()
+        buffer.enqueue(KEY, writer, item(0), batch_size=100, flush_interval=10)
+        buffer.enqueue(KEY, writer, item(1), batch_size=2, flush_interval=10)
+        await asyncio.sleep(0.01)
+        return writer
+
+    assert asyncio.run(scenario()).batches == [["turn 0", "turn 1"]]
+
+
+def test_failed_timer_flush_is_retried_without_new_stores():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter(failures=3)
+        buffer.enqueue(KEY, writer, item(0), batch_size=100, flush_interval=0.02)
+        await asyncio.sleep(0.6)
+        return buffer, writer
+
+    buffer, writer = asyncio.run(scenario())
+    assert writer.attempts == 4
+    assert writer.batches == [["turn 0"]]
+    assert buffer.pending(KEY) == []
+
+
+def test_failed_size_flush_is_retried():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter(failures=1)
+        buffer.enqueue(KEY, writer, item(0), batch_size=1, flush_interval=0.02)
+        await asyncio.sleep(0.2)
+        return writer
+
+    assert asyncio.run(scenario()).batches == [["turn 0"]]
+
+
+def test_pending_reports_in_flight_batch_exactly_once():
+    async def scenario():
+        gate = asyncio.Event()
+        buffer, writer = WriteBehindBuffer(), FakeWriter(gate=gate)
+        buffer.enqueue(KEY, writer, item(0), batch_size=1, flush_interval=10)
+        await asyncio.sleep(0.01)
+        during = [i["content"] for i in buffer.pending(KEY)]
+        gate.set()
+        await asyncio.sleep(0.01)
+        return during, buffer.pending(KEY)
+
+    during, after = asyncio.run(scenario())
+    assert during == ["turn 0"]
+    assert after == []
+
+
+def test_buffer_is_capped_dropping_oldest():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(max_items=3), FakeWriter()
+        for n in range(5):
+            buffer.enqueue(KEY, writer, item(n), batch_size=100, flush_interval=10)
+        pending = [i["content"] for i in buffer.pending(KEY)]
+        await buffer.flush_all()
+        return pending
+
+    assert asyncio.run(scenario()) == ["turn 2", "turn 3", "turn 4"]
+
+
+def test_flush_all_writes_remaining_items():
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter(failures=1)
+        buffer.enqueue(KEY, writer, item(0), batch_size=100, flush_interval=10)
+        await buffer.flush_all(retries=3, retry_delay=0.01)
+        return buffer, writer
+
+    buffer, writer = asyncio.run(scenario())
+    assert writer.batches == [["turn 0"]]
+    assert buffer.pending(KEY) == []
+
+
+def test_flush_all_logs_items_it_cannot_write(caplog):
+    async def scenario():
+        buffer, writer = WriteBehindBuffer(), FakeWriter(failures=100)
+        buffer.enqueue(KEY, writer, item(0), batch_size=100, flush_interval=10)
+        await buffer.flush_all(retries=2, retry_delay=0.01)
+        return buffer, writer
+
+    buffer, writer = asyncio.run(scenario())
+    assert writer.attempts == 2
+    assert buffer.pending(KEY) == []
+    dropped = [r for r in caplog.records if r.getMessage() == "memory.dropped_on_shutdown"]
+    assert dropped and dropped[0].fields["items"] == ["turn 0"]
+
+
+@pytest.fixture
+def local_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "DEFAULT_SQLITE_PATH", str(tmp_path / "memory.db"))
+    buffer = WriteBehindBuffer()
+    monkeypatch.setattr(memory, "write_buffer", buffer)
+    return buffer
+
+
+def test_memory_reads_its_own_unflushed_writes(local_memory):
+    async def scenario():
+        node = MemoryNode({"writeBatchSize": 100, "writeFlushMs": 10_000, "topK": 10})
+        for n in range(3):
+            await node.store(f"turn {n}")
+        before = await node.retrieve("")
+        await local_memory.flush_all()
+        return before, await node.retrieve("")
+
+    before, after = asyncio.run(scenario())
+    assert before == after == "turn 0\nturn 1\nturn 2"
+
+
+def test_memory_does_not_duplicate_batch_committed_but_still_in_flight(local_memory, monkeypatch):
+    async def scenario():
+        released = asyncio.Event()
+
+        async def slow_store(self, items):
+            await asyncio.to_thread(self._write_local, items)
+            await released.wait()
+
+        monkeypatch.setattr(MemoryNode, "_store_local", slow_store)
+        node = MemoryNode({"writeBatchSize": 1, "topK": 10})
+        await node.store("turn 0")
+        await asyncio.sleep(0.05)
+        during = await node.retrieve("")
+        released.set()
+        await local_memory.flush_all()
+        return during
+
+    assert asyncio.run(scenario()) == "turn 0"
+
+
+def test_local_provider_ignores_connection_string(local_memory, tmp_path):
+    async def scenario():
+        node = MemoryNode({"connectionString": str(tmp_path / "elsewhere.db")})
+        await node.store("turn 0")
+        await local_memory.flush_all()
+
+    asyncio.run(scenario())
+    assert (tmp_path / "memory.db").exists()
+    assert not (tmp_path / "elsewhere.db").exists()
+
+
+def test_shutdown_waits_for_in_flight_timer_write_instead_of_rewriting(local_memory, monkeypatch):
+    import time as _time
+
+    def slow_write(self, items, _original=MemoryNode._write_local):
+        _time.sleep(0.2)
+        _original(self, items)
+
+    monkeypatch.setattr(MemoryNode, "_write_local", slow_write)
+
+    async def scenario():
+        node = MemoryNode({"writeBatchSize": 100, "writeFlushMs": 10})
+        await node.store("turn 0")
+        await asyncio.sleep(0.05)  # timer flush is now inside the slow write
+        await local_memory.flush_all()
+        return node
+
+    node = asyncio.run(scenario())
+    conn = node._sqlite()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_local_writes_are_idempotent(local_memory):
+    node = MemoryNode({})
+    items = [{"id": "a", "content": "turn 0", "metadata": {}, "created_at": 0.0}]
+    node._write_local(items)
+    node._write_local(items)
+    assert node._read_local(10) == [("a", "turn 0")]
+
+
+def test_shutdown_does_not_cancel_and_resend_a_write_in_progress():
+    import time as _time
+
+    async def scenario():
+        buffer, writes = WriteBehindBuffer(), []
+
+        def write(batch):
+            _time.sleep(0.2)
+            writes.append([i["content"] for i in batch])
+
+        async def threaded_writer(batch):
+            # Like sqlite via to_thread: cancelling the await does not stop the write
+            await asyncio.to_thread(write, batch)
+
+        buffer.enqueue(KEY, threaded_writer, item(0), batch_size=100, flush_interval=0.01)
+        await asyncio.sleep(0.05)
+        await buffer.flush_all()
+        return writes
+
+    assert asyncio.run(scenario()) == [["turn 0"]]